@@ -1,9 +1,10 @@
 # analyze_experiment.py
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.sql.elements import TextClause
 import matplotlib.pyplot as plt
 import sys
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 import os
 from dotenv import load_dotenv, find_dotenv
 
@@ -27,62 +28,80 @@ except KeyError as e:
 # Crear la URI con las variables leídas
 DB_URI = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Engine único a nivel de módulo: su pool reutiliza las conexiones entre consultas
+ENGINE = create_engine(DB_URI, pool_pre_ping=True)
 
-def get_experiment_data(experiment_id: int) -> Optional[pd.DataFrame]:
+# Filas traídas por lote desde el cursor del servidor (evita materializar toda la traza)
+TRACE_CHUNK_SIZE = 50
+TRACE_DTYPES = {'generation_num': 'int32', 'live_cells_count': 'int32'}
+
+
+def read_sql_chunks(query: TextClause, params: dict) -> Iterator[pd.DataFrame]:
+    """
+    Ejecuta la consulta (con parámetros enlazados) con un cursor del lado del servidor
+    y la devuelve en lotes de TRACE_CHUNK_SIZE filas.
     """
-    Conecta a PostgreSQL usando SQLAlchemy y extrae la traza completa de un experimento.
+    with ENGINE.connect() as conn:
+        streaming_conn = conn.execution_options(stream_results=True, max_row_buffer=TRACE_CHUNK_SIZE)
+        yield from pd.read_sql_query(query, streaming_conn, params=params, chunksize=TRACE_CHUNK_SIZE)
+
+
+def get_experiment_data(experiment_id: int) -> Optional[Tuple[dict, pd.DataFrame]]:
+    """
+    Conecta a PostgreSQL usando SQLAlchemy y extrae los metadatos (una fila) y la traza completa
+    de un experimento. Devuelve (metadatos, traza).
     """
-    engine = None
     try:
-        # 1. Crear el Engine de SQLAlchemy
-        engine = create_engine(DB_URI)
         print(f"✅ Conexión a la BD (SQLAlchemy) exitosa para Experimento ID: {experiment_id}")
         
-        # 2. Consulta SQL para unir metadatos y traza
-        query = f"""
+        # Parámetros enlazados: sin riesgo de inyección SQL y con el mismo texto de sentencia
+        # para todos los experimentos (se agrupan en pg_stat_statements)
+        query_params = {"experiment_id": experiment_id}
+        
+        # 1. Metadatos del experimento (una sola fila, sin repetirlos en cada generación)
+        meta_query = text("""
         SELECT 
-            t.generation_num,
-            t.capture_time,
-            t.live_cells_count,
-            e.name AS experiment_name,
-            e.board_size,
-            e.duration_seconds
-        FROM raw_data.generation_trace t
-        JOIN raw_data.experiments e ON t.experiment_id = e.experiment_id
-        WHERE t.experiment_id = {experiment_id}
-        ORDER BY t.generation_num ASC;
-        """
+            name AS experiment_name,
+            board_size,
+            duration_seconds
+        FROM raw_data.experiments
+        WHERE experiment_id = :experiment_id;
+        """)
+        with ENGINE.connect() as conn:
+            meta = conn.execute(meta_query, query_params).mappings().first()
         
-        # 3. Leer datos usando el Engine. Pandas ahora usará la conexión recomendada.
-        # Aquí ya no pasamos la conexión de psycopg2 (conn), sino el engine de SQLAlchemy
-        df = pd.read_sql_query(query, engine) 
+        # 2. Traza del experimento, leída por lotes usando el Engine del módulo (reutiliza las conexiones de su pool)
+        trace_query = text("""
+        SELECT 
+            generation_num,
+            capture_time,
+            live_cells_count
+        FROM raw_data.generation_trace
+        WHERE experiment_id = :experiment_id
+        ORDER BY generation_num ASC;
+        """)
+        chunks = [chunk for chunk in read_sql_chunks(trace_query, query_params) if not chunk.empty] if meta else []
         
-        if df.empty:
+        if not chunks:
             print(f"⚠️ No se encontraron datos para el Experimento ID {experiment_id}.")
             return None
 
-        return df
+        return dict(meta), pd.concat(chunks, ignore_index=True).astype(TRACE_DTYPES)
 
     except Exception as e:
         # El manejo de errores de SQLAlchemy es más genérico
         print(f"❌ Error al conectar o ejecutar SQL: {e}")
         return None
-    finally:
-        # El engine se encarga de cerrar las conexiones automáticamente
-        if engine:
-             # Opcional: Dispose the engine if it won't be reused for a while
-             engine.dispose()
-             pass
-
-def basic_eda(df: pd.DataFrame, experiment_id: int):
+
+def basic_eda(meta: dict, df: pd.DataFrame, experiment_id: int):
     """
     Realiza un análisis descriptivo básico y genera un gráfico.
     """
     print("\n--- Análisis Descriptivo ---")
-    print(f"Experimento: {df['experiment_name'].iloc[0]}")
-    print(f"Tamaño del Tablero: {df['board_size'].iloc[0]}x{df['board_size'].iloc[0]}")
+    print(f"Experimento: {meta['experiment_name']}")
+    print(f"Tamaño del Tablero: {meta['board_size']}x{meta['board_size']}")
     print(f"Generaciones registradas: {len(df)}")
-    print(f"Duración de la simulación: {df['duration_seconds'].iloc[0]} segundos")
+    print(f"Duración de la simulación: {meta['duration_seconds']} segundos")
     
     print("\nEstadísticas de Células Vivas:")
     print(df['live_cells_count'].describe())
@@ -121,9 +140,10 @@ if __name__ == "__main__":
     print(f"\n🚀 Iniciando análisis del Experimento ID: {TARGET_EXPERIMENT_ID}")
     
     # 3. Ejecutar el análisis con el ID proporcionado
-    df_experiment = get_experiment_data(TARGET_EXPERIMENT_ID)
+    experiment_data = get_experiment_data(TARGET_EXPERIMENT_ID)
     
-    if df_experiment is not None:
-        basic_eda(df_experiment, TARGET_EXPERIMENT_ID)
+    if experiment_data is not None:
+        meta_experiment, df_experiment = experiment_data
+        basic_eda(meta_experiment, df_experiment, TARGET_EXPERIMENT_ID)
     else:
         print("Finalizando análisis.")
\ No newline at end of file
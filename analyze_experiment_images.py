@@ -1,15 +1,18 @@
 # analyze_experiment.py - Versión con Animación y Reglas
 
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.sql.elements import TextClause
 import matplotlib.pyplot as plt
+import matplotlib.animation as animation
 import sys
-from typing import Optional, List
+from typing import Iterator, Optional, Tuple
 import os
+import multiprocessing
+import subprocess
 from dotenv import load_dotenv, find_dotenv
 import numpy as np
-import ast # Necesario para deserializar la cadena del tablero
-import imageio.v2 as imageio # Para crear el GIF
+import imageio.v2 as imageio # Para crear el GIF (si ffmpeg no está disponible)
 
 load_dotenv(find_dotenv())
 
@@ -31,112 +34,273 @@ except KeyError as e:
 # Crear la URI con las variables leídas
 DB_URI = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Engine único a nivel de módulo: su pool reutiliza las conexiones entre consultas
+ENGINE = create_engine(DB_URI, pool_pre_ping=True)
 
-def get_experiment_data(experiment_id: int) -> Optional[pd.DataFrame]:
+# Filas traídas por lote desde el cursor del servidor (evita materializar toda la traza)
+TRACE_CHUNK_SIZE = 50
+TRACE_DTYPES = {'generation_num': 'int32', 'live_cells_count': 'int32'}
+
+ANIMATION_FPS = 5 # Frames por segundo de la animación (ajústalo a tu gusto)
+PARALLEL_RENDER_MIN_FRAMES = 200 # A partir de aquí los frames se rasterizan en paralelo
+
+
+def read_sql_chunks(query: TextClause, params: dict) -> Iterator[pd.DataFrame]:
+    """
+    Ejecuta la consulta (con parámetros enlazados) con un cursor del lado del servidor
+    y la devuelve en lotes de TRACE_CHUNK_SIZE filas.
+    """
+    with ENGINE.connect() as conn:
+        streaming_conn = conn.execution_options(stream_results=True, max_row_buffer=TRACE_CHUNK_SIZE)
+        yield from pd.read_sql_query(query, streaming_conn, params=params, chunksize=TRACE_CHUNK_SIZE)
+
+
+def get_experiment_data(experiment_id: int) -> Optional[Tuple[dict, pd.DataFrame]]:
     """
-    Conecta a PostgreSQL, extrae la traza completa, las reglas y el estado RAW.
+    Conecta a PostgreSQL y extrae los metadatos del experimento (una fila, con las reglas)
+    y su traza (sin el estado RAW del tablero). Devuelve (metadatos, traza).
+    El estado del tablero se lee en streaming con `iter_board_chunks` al generar la animación.
     """
-    engine = None
     try:
-        engine = create_engine(DB_URI)
         print(f"✅ Conexión a la BD (SQLAlchemy) exitosa para Experimento ID: {experiment_id}")
         
-        # 2. Consulta SQL con las nuevas columnas de configuración
-        query = f"""
+        # Parámetros enlazados: sin riesgo de inyección SQL y con el mismo texto de sentencia
+        # para todos los experimentos (se agrupan en pg_stat_statements)
+        query_params = {"experiment_id": experiment_id}
+        
+        # 1. Metadatos y reglas del experimento (una sola fila, sin repetirlos en cada generación)
+        meta_query = text("""
         SELECT 
-            t.generation_num,
-            t.capture_time,
-            t.live_cells_count,
-            t.board_state, -- <--- ¡IMPORTANTE: Extrayendo el estado RAW!
-            e.name AS experiment_name,
-            e.board_size,
-            e.duration_seconds,
-            e.rules_notation, -- <--- NUEVAS COLUMNAS
-            e.survival_rules,
-            e.birth_rules
-        FROM raw_data.generation_trace t
-        JOIN raw_data.experiments e ON t.experiment_id = e.experiment_id
-        WHERE t.experiment_id = {experiment_id}
-        ORDER BY t.generation_num ASC;
-        """
+            name AS experiment_name,
+            board_size,
+            duration_seconds,
+            rules_notation,
+            survival_rules,
+            birth_rules
+        FROM raw_data.experiments
+        WHERE experiment_id = :experiment_id;
+        """)
+        with ENGINE.connect() as conn:
+            meta = conn.execute(meta_query, query_params).mappings().first()
         
-        df = pd.read_sql_query(query, engine) 
+        # 2. Traza del experimento
+        trace_query = text("""
+        SELECT 
+            generation_num,
+            capture_time,
+            live_cells_count
+        FROM raw_data.generation_trace
+        WHERE experiment_id = :experiment_id
+        ORDER BY generation_num ASC;
+        """)
+        chunks = [chunk for chunk in read_sql_chunks(trace_query, query_params) if not chunk.empty] if meta else []
         
-        if df.empty:
+        if not chunks:
             print(f"⚠️ No se encontraron datos para el Experimento ID {experiment_id}.")
             return None
 
-        return df
+        return dict(meta), pd.concat(chunks, ignore_index=True).astype(TRACE_DTYPES)
 
     except Exception as e:
         print(f"❌ Error al conectar o ejecutar SQL: {e}")
         return None
+
+
+def iter_board_chunks(experiment_id: int) -> Iterator[pd.DataFrame]:
+    """
+    Recorre los estados RAW del tablero (BYTEA) de un experimento por lotes, en orden de generación.
+    """
+    query = text("""
+    SELECT generation_num, live_cells_count, board_state
+    FROM raw_data.generation_trace
+    WHERE experiment_id = :experiment_id
+    ORDER BY generation_num ASC;
+    """)
+    return read_sql_chunks(query, {"experiment_id": experiment_id})
+
+
+def decode_board(board_state: bytes, board_size: int) -> np.ndarray:
+    """Deserializa los bits empaquetados (BYTEA) del tablero."""
+    bits = np.frombuffer(board_state, dtype=np.uint8)
+    return np.unpackbits(bits, count=board_size * board_size).reshape(board_size, board_size)
+
+
+def iter_board_rows(experiment_id: int, board_size: int) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Recorre en streaming cada generación como (generation_num, live_cells_count, board_state).
+    Las generaciones cuyo board_state no es un tablero de `board_size` válido se reportan y se omiten.
+    """
+    expected_bytes = -(-board_size * board_size // 8)
+    for chunk in iter_board_chunks(experiment_id):
+        chunk_rows = zip(
+            chunk['generation_num'].to_numpy(),
+            chunk['live_cells_count'].to_numpy(),
+            chunk['board_state'].to_numpy(),
+        )
+        for generation_num, live_cells_count, board_state in chunk_rows:
+            try:
+                board_state = bytes(board_state)
+                if len(board_state) != expected_bytes:
+                    raise ValueError(f"board_state de {len(board_state)} bytes (se esperaban {expected_bytes})")
+            except Exception as e:
+                print(f"Error al procesar la generación {generation_num}: {e}")
+                continue
+            yield int(generation_num), int(live_cells_count), board_state
+
+
+def iter_frames(experiment_id: int, board_size: int) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """
+    Decodifica en streaming cada generación como (generation_num, live_cells_count, tablero).
+    """
+    for generation_num, live_cells_count, board_state in iter_board_rows(experiment_id, board_size):
+        yield generation_num, live_cells_count, decode_board(board_state, board_size)
+
+
+def build_board_figure(experiment_id: int, rules_notation: str, board_size: int):
+    """
+    Crea la figura de la animación una sola vez (ejes, rejilla y títulos no cambian entre frames).
+    Devuelve (fig, board_image, generation_title).
+    """
+    fig, ax = plt.subplots(figsize=(6, 6))
+    fig.suptitle(f"ID {experiment_id} - Reglas: {rules_notation}")
+    board_image = ax.imshow(
+        np.zeros((board_size, board_size)), cmap='binary', vmin=0, vmax=1, interpolation='nearest'
+    )
+    generation_title = ax.set_title("", fontsize=10)
+    ax.set_xticks(np.arange(-0.5, board_size, 1), minor=True)
+    ax.set_yticks(np.arange(-0.5, board_size, 1), minor=True)
+    ax.grid(which='minor', color='gray', linestyle='-', linewidth=0.5)
+    ax.tick_params(which='minor', size=0)
+    ax.set_yticklabels([])
+    ax.set_xticklabels([])
+    return fig, board_image, generation_title
+
+
+def draw_board(board_image, generation_title, frame: Tuple[int, int, np.ndarray]):
+    """Renderiza un frame: solo cambian los datos de la imagen y el título."""
+    generation_num, live_cells_count, board_array = frame
+    board_image.set_data(board_array)
+    generation_title.set_text(f"Generación: {generation_num} | Células: {live_cells_count}")
+    return board_image, generation_title
+
+
+# --- Renderizado paralelo (un proceso por CPU, cada uno con su propia figura) ---
+
+_worker_figure = None
+
+
+def _init_render_worker(experiment_id: int, rules_notation: str, board_size: int):
+    global _worker_figure
+    _worker_figure = build_board_figure(experiment_id, rules_notation, board_size)
+
+
+def _render_frame(row: Tuple[int, int, bytes]) -> np.ndarray:
+    """Rasteriza una generación en el proceso worker y devuelve el frame RGBA."""
+    fig, board_image, generation_title = _worker_figure
+    generation_num, live_cells_count, board_state = row
+    board_size = board_image.get_array().shape[0]
+    draw_board(board_image, generation_title, (generation_num, live_cells_count, decode_board(board_state, board_size)))
+    fig.canvas.draw()
+    return np.array(fig.canvas.buffer_rgba())
+
+
+def render_mp4_parallel(experiment_id: int, rules_notation: str, board_size: int, output_filename: str):
+    """
+    Rasteriza los frames en paralelo (multiprocessing) y los envía en orden a ffmpeg por stdin.
+    """
+    ffmpeg = None
+    initargs = (experiment_id, rules_notation, board_size)
+    try:
+        with multiprocessing.Pool(os.cpu_count(), initializer=_init_render_worker, initargs=initargs) as pool:
+            for frame in pool.imap(_render_frame, iter_board_rows(experiment_id, board_size), chunksize=8):
+                if ffmpeg is None:
+                    # El tamaño del frame se conoce con el primer frame renderizado
+                    height, width = frame.shape[:2]
+                    ffmpeg = subprocess.Popen(
+                        [
+                            plt.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f"{width}x{height}",
+                            '-r', str(ANIMATION_FPS), '-i', '-',
+                            '-vcodec', plt.rcParams['animation.codec'], '-b:v', '1800k', '-pix_fmt', 'yuv420p',
+                            output_filename,
+                        ],
+                        stdin=subprocess.PIPE,
+                    )
+                ffmpeg.stdin.write(frame.tobytes())
     finally:
-        if engine:
-             engine.dispose()
-             pass
+        if ffmpeg is not None:
+            ffmpeg.stdin.close()
+            if ffmpeg.wait() != 0:
+                raise RuntimeError(f"ffmpeg terminó con código {ffmpeg.returncode}")
 
 
-def create_simulation_gif(df: pd.DataFrame, experiment_id: int):
+def create_simulation_gif(meta: dict, df: pd.DataFrame, experiment_id: int):
     """
-    Deserializa el estado del tablero en cada generación y crea un GIF animado.
+    Deserializa el estado del tablero en cada generación y crea la animación:
+    MP4 (ffmpeg) si está disponible, o un GIF animado en caso contrario.
+    Las corridas largas (PARALLEL_RENDER_MIN_FRAMES o más) se rasterizan en paralelo.
     """
-    output_filename = f"simulation_{experiment_id}.gif"
-    frames = []
+    use_mp4 = animation.FFMpegWriter.isAvailable()
+    output_filename = f"simulation_{experiment_id}.{'mp4' if use_mp4 else 'gif'}"
+    
+    # El tamaño del tablero y las reglas son constantes
+    board_size = int(meta['board_size'])
+    rules_notation = meta['rules_notation']
+    
+    print(f"\n🎬 Generando animación del tablero (Guardando en {output_filename})...")
+    
+    if use_mp4 and len(df) >= PARALLEL_RENDER_MIN_FRAMES:
+        render_mp4_parallel(experiment_id, rules_notation, board_size, output_filename)
+        print(f"✅ Animación guardada exitosamente en {output_filename}")
+        return
     
     # 1. Configuración de la figura para la animación
-    fig, ax = plt.subplots(figsize=(6, 6))
-    plt.title(f"ID {experiment_id} - Reglas: {df['rules_notation'].iloc[0]}")
+    fig, board_image, generation_title = build_board_figure(experiment_id, rules_notation, board_size)
     
-    # El tamaño del tablero es constante
-    board_size = df['board_size'].iloc[0]
+    def init():
+        return board_image, generation_title
     
-    print(f"\n🎬 Generando animación del tablero (Guardando en {output_filename})...")
+    def update(frame):
+        # 2. Renderizar el tablero
+        return draw_board(board_image, generation_title, frame)
     
-    for index, row in df.iterrows():
-        try:
-            # Deserializar la cadena del tablero a una lista de listas de Python
-            board_list = ast.literal_eval(row['board_state'])
-            board_array = np.array(board_list, dtype=int)
-            
-            # 2. Renderizar el tablero
-            ax.clear()
-            ax.imshow(board_array, cmap='binary', interpolation='nearest')
-            ax.set_title(f"Generación: {row['generation_num']} | Células: {row['live_cells_count']}", fontsize=10)
-            ax.set_xticks(np.arange(-0.5, board_size, 1), minor=True)
-            ax.set_yticks(np.arange(-0.5, board_size, 1), minor=True)
-            ax.grid(which='minor', color='gray', linestyle='-', linewidth=0.5)
-            ax.tick_params(which='minor', size=0)
-            ax.set_yticklabels([])
-            ax.set_xticklabels([])
-            
-            # 3. Capturar el Frame
-            fig.canvas.draw()
-            image = np.frombuffer(fig.canvas.tostring_rgb(), dtype='uint8')
-            image = image.reshape(fig.canvas.get_width_height()[::-1] + (3,))
-            frames.append(image)
-            
-        except Exception as e:
-            print(f"Error al procesar la generación {row['generation_num']}: {e}")
-            continue
+    if use_mp4:
+        # 3. Codificar con ffmpeg, consumiendo los frames en streaming
+        simulation_animation = animation.FuncAnimation(
+            fig, update, frames=iter_frames(experiment_id, board_size), init_func=init,
+            save_count=len(df), blit=True, cache_frame_data=False
+        )
+        simulation_animation.save(output_filename, writer=animation.FFMpegWriter(fps=ANIMATION_FPS, bitrate=1800))
+    else:
+        # 3. Sin ffmpeg: escribir cada frame al GIF a medida que se captura
+        with imageio.get_writer(output_filename, mode='I', fps=ANIMATION_FPS) as writer:
+            for frame in iter_frames(experiment_id, board_size):
+                try:
+                    update(frame)
+                    fig.canvas.draw()
+                    # Vista directa del buffer del canvas (sin copia a bytes ni reshape)
+                    writer.append_data(np.asarray(fig.canvas.buffer_rgba())[..., :3])
+                    
+                except Exception as e:
+                    print(f"Error al procesar la generación {frame[0]}: {e}")
+                    continue
 
     plt.close(fig) # Cerrar la figura para liberar memoria
-    
-    # 4. Crear el GIF
-    imageio.mimsave(output_filename, frames, fps=5) # 5 frames por segundo (ajústalo a tu gusto)
     print(f"✅ Animación guardada exitosamente en {output_filename}")
 
 
-def basic_eda(df: pd.DataFrame, experiment_id: int):
+def basic_eda(meta: dict, df: pd.DataFrame, experiment_id: int):
     """
     Realiza un análisis descriptivo básico y genera el gráfico de población.
     """
     print("\n--- Análisis Descriptivo ---")
-    print(f"Experimento: {df['experiment_name'].iloc[0]}")
-    print(f"Reglas: {df['rules_notation'].iloc[0]} (S: {df['survival_rules'].iloc[0]}, B: {df['birth_rules'].iloc[0]})") # <--- LÍNEA MEJORADA
-    print(f"Tamaño del Tablero: {df['board_size'].iloc[0]}x{df['board_size'].iloc[0]}")
+    print(f"Experimento: {meta['experiment_name']}")
+    survival_rules = ', '.join(map(str, meta['survival_rules'])) # Columnas INTEGER[]
+    birth_rules = ', '.join(map(str, meta['birth_rules']))
+    print(f"Reglas: {meta['rules_notation']} (S: {survival_rules}, B: {birth_rules})")
+    print(f"Tamaño del Tablero: {meta['board_size']}x{meta['board_size']}")
     print(f"Generaciones registradas: {len(df)}")
-    print(f"Duración de la simulación: {df['duration_seconds'].iloc[0]} segundos")
+    print(f"Duración de la simulación: {meta['duration_seconds']} segundos")
     
     print("\nEstadísticas de Células Vivas:")
     print(df['live_cells_count'].describe())
@@ -145,7 +309,7 @@ def basic_eda(df: pd.DataFrame, experiment_id: int):
     
     plt.figure(figsize=(10, 6))
     plt.plot(df['generation_num'], df['live_cells_count'], marker='o', linestyle='-', markersize=2)
-    plt.title(f"Evolución de Células Vivas - Experimento ID {experiment_id} | Reglas: {df['rules_notation'].iloc[0]}")
+    plt.title(f"Evolución de Células Vivas - Experimento ID {experiment_id} | Reglas: {meta['rules_notation']}")
     plt.xlabel("Número de Generación (Paso)")
     plt.ylabel("Células Vivas (live_cells_count)")
     plt.grid(True)
@@ -172,10 +336,11 @@ if __name__ == "__main__":
 
     print(f"\n🚀 Iniciando análisis del Experimento ID: {TARGET_EXPERIMENT_ID}")
     
-    df_experiment = get_experiment_data(TARGET_EXPERIMENT_ID)
+    experiment_data = get_experiment_data(TARGET_EXPERIMENT_ID)
     
-    if df_experiment is not None:
-        basic_eda(df_experiment, TARGET_EXPERIMENT_ID)
-        create_simulation_gif(df_experiment, TARGET_EXPERIMENT_ID) # <--- ¡Nueva función de animación!
+    if experiment_data is not None:
+        meta_experiment, df_experiment = experiment_data
+        basic_eda(meta_experiment, df_experiment, TARGET_EXPERIMENT_ID)
+        create_simulation_gif(meta_experiment, df_experiment, TARGET_EXPERIMENT_ID) # <--- Animación MP4 (o GIF sin ffmpeg)
     else:
         print("Finalizando análisis.")
\ No newline at end of file
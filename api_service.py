@@ -1,16 +1,30 @@
 # api_service.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import psycopg2
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+from sqlalchemy.exc import DBAPIError
 import numpy as np
 import datetime
-import time
 import json
 import asyncio
+import io
+import hashlib
+from contextlib import asynccontextmanager
 
 import os
 
-from typing import List
+from typing import Callable, Dict, List, Optional
+
+try:
+    # Numba es opcional: solo se usa con SIMULATION_ENGINE=numba
+    from numba import njit, prange
+except ImportError:
+    njit = None
 
 # --- Configuración de la BD (Ajusta a tus valores) ---
 DB_HOST = os.environ.get("DB_HOST", None)
@@ -19,7 +33,54 @@ DB_NAME = os.environ.get("DB_NAME", None)
 DB_USER = os.environ.get("DB_USER", None)
 DB_PASSWORD = os.environ.get("DB_PASSWORD", None)
 
-app = FastAPI(title="Conway Data Generator API")
+# Pool de conexiones compartido por todas las peticiones y simulaciones (QueuePool).
+# Detrás de PgBouncer en modo transacción, desactiva el pre-ping con DB_POOL_PRE_PING=0.
+ENGINE = create_engine(
+    URL.create(
+        "postgresql+psycopg2",
+        username=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=int(DB_PORT) if DB_PORT else None,
+        database=DB_NAME,
+    ),
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=30,
+    pool_recycle=300,
+    pool_pre_ping=os.environ.get("DB_POOL_PRE_PING", "1") != "0",
+)
+
+# Generaciones acumuladas en memoria antes de cada INSERT multi-fila + COMMIT
+TRACE_BATCH_SIZE = 25
+
+# Experimentos sin pausa entre pasos (real_time=False): generaciones por cada COPY + COMMIT
+TRACE_COPY_BATCH_SIZE = 500
+
+# Tiempo máximo (segundos) que /status/{experiment_id}/wait retiene una petición de long-polling
+LONG_POLL_TIMEOUT = 10.0
+
+# Intervalo (segundos) entre comentarios keep-alive de /status/stream/{experiment_id} sin cambios de estado
+SSE_KEEPALIVE_INTERVAL = 15.0
+
+# Experimentos cuyo estado se conserva en memoria (los más antiguos se consultan en la BD)
+STATUS_CACHE_SIZE = 1000
+
+# Lado mínimo del tablero a partir del cual cada paso de la simulación se calcula en el threadpool
+# (por debajo, el salto de hilo cuesta más que el propio cálculo)
+THREADPOOL_STEP_MIN_SIZE = 256
+
+# Motor de simulación: "auto" (NumPy o bitboard según el tamaño), "numpy", "bitboard" o "numba"
+SIMULATION_ENGINE = os.environ.get("SIMULATION_ENGINE", "auto")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_simulation_engine()
+    yield
+
+
+app = FastAPI(title="Conway Data Generator API", lifespan=lifespan)
 
 # --- Esquemas de Datos para la API (Pydantic) ---
 
@@ -31,40 +92,232 @@ class ExperimentConfig(BaseModel):
     survival_rules: List[int] = [2, 3]
     birth_rules: List[int] = [3]
     rules_notation: str = "B3/S23"
+    real_time: bool = True # False: sin pausa entre pasos y traza cargada con COPY
 
 # --- Lógica de la Simulación ---
-def next_generation(board: np.ndarray, survival_rules: List[int], birth_rules: List[int]) -> np.ndarray:
-    """Calcula la próxima generación del AC basándose en las reglas S/B."""
+def rules_to_mask(rules: List[int]) -> int:
+    """
+    Convierte una lista de reglas S/B en una máscara de 9 bits: el bit k indica si k vecinos cumplen la regla.
+    Se calcula una vez por experimento; los kernels evalúan la regla con `(mask >> vecinos) & 1`.
+    """
+    return sum(1 << rule for rule in set(rules) if 0 <= rule <= 8)
+
+
+def next_generation(
+    board: np.ndarray, survival_mask: int, birth_mask: int, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+    """
+    Calcula la próxima generación del AC basándose en las máscaras de reglas S/B (vectorizado con NumPy).
+    Si se pasa `out` (int8, misma forma que `board`), la generación se escribe ahí en lugar de en un array nuevo.
+    """
     size = board.shape[0]
-    new_board = np.zeros(board.shape, dtype=int)
     
-    for i in range(size):
-        for j in range(size):
-            # Contar vecinos vivos (usando toroidales para bordes) - La lógica de conteo es la misma
-            # NOTA: Mejorar a conteo toroidal si quieres reglas que manejen los bordes de manera especial.
-            total_live = np.sum(board[max(0, i-1):i+2, max(0, j-1):j+2]) - board[i, j]
-            
-            # Aplicar las reglas S/B
-            if board[i, j] == 1:
-                # REGLA DE SUPERVIVENCIA: Si está viva, debe cumplir las reglas de supervivencia para seguir viva
-                if total_live in survival_rules:
-                    new_board[i, j] = 1 # Sobrevive
-                else:
-                    new_board[i, j] = 0 # Muere
-            else:
-                # REGLA DE NACIMIENTO: Si está muerta, debe cumplir las reglas de nacimiento para nacer
-                if total_live in birth_rules:
-                    new_board[i, j] = 1 # Nace
-                else:
-                    new_board[i, j] = 0 # Permanece muerta
+    # Contar vecinos vivos de todo el tablero a la vez: se rellena con un borde de ceros
+    # (las células fuera del tablero cuentan como muertas) y se suman las 8 vistas desplazadas.
+    padded = np.pad(board.astype(np.int8, copy=False), 1, mode='constant', constant_values=0)
+    neighbors = np.zeros(board.shape, dtype=np.int8)
+    for di in (0, 1, 2):
+        for dj in (0, 1, 2):
+            if di == 1 and dj == 1:
+                continue
+            neighbors += padded[di:di + size, dj:dj + size]
+    
+    # Aplicar las reglas S/B sin ramas: las vivas usan SUPERVIVENCIA, las muertas NACIMIENTO
+    rule_masks = np.where(board.astype(bool), np.int16(survival_mask), np.int16(birth_mask))
+    if out is None:
+        out = np.empty(board.shape, dtype=np.int8)
+    np.bitwise_and(rule_masks >> neighbors, 1, out=out, casting='unsafe')
                     
-    return new_board
+    return out
+
+# --- Tablero empaquetado en bits (SWAR) ---
+# A partir de este tamaño compensa empaquetar cada fila en palabras de 64 bits:
+# cada operación bit a bit procesa 64 células en paralelo.
+BITBOARD_MIN_SIZE = 64
+
+_ONE = np.uint64(1)
+_LAST_BIT = np.uint64(63)
+_ALL_BITS = ~np.uint64(0)
+
+
+def pack_board(board: np.ndarray) -> np.ndarray:
+    """Empaqueta cada fila del tablero en palabras uint64 (la columna j es el bit j % 64 de la palabra j // 64)."""
+    size = board.shape[0]
+    num_words = -(-size // 64)
+    padded = np.zeros((size, num_words * 64), dtype=np.uint8)
+    padded[:, :size] = board
+    packed = np.packbits(padded, axis=1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64, copy=False)
+
+
+def unpack_board(packed: np.ndarray, size: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Inverso de `pack_board`: devuelve el tablero denso de 0/1 (en `out` si se pasa)."""
+    as_bytes = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8)
+    bits = np.unpackbits(as_bytes, axis=1, count=size, bitorder='little').view(np.int8)
+    if out is None:
+        return bits
+    np.copyto(out, bits)
+    return out
+
+
+def _full_adder(a: np.ndarray, b: np.ndarray, c: np.ndarray):
+    """Suma tres planos de bits carril a carril: devuelve (suma, acarreo)."""
+    partial = a ^ b
+    return partial ^ c, (a & b) | (partial & c)
+
+
+def _rule_plane(count_bits: List[np.ndarray], rule_mask: int) -> np.ndarray:
+    """Plano con 1 en los carriles cuyo conteo de vecinos está en la máscara de reglas."""
+    plane = np.zeros_like(count_bits[0])
+    for rule in range(9):
+        if not (rule_mask >> rule) & 1:
+            continue
+        match = np.full_like(plane, _ALL_BITS)
+        for bit, bit_plane in enumerate(count_bits):
+            match &= bit_plane if (rule >> bit) & 1 else ~bit_plane
+        plane |= match
+    return plane
+
+
+def next_generation_bitboard(
+    board: np.ndarray, survival_mask: int, birth_mask: int, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+    """
+    Igual que `next_generation`, pero contando vecinos con sumadores SWAR sobre el tablero
+    empaquetado en uint64 (un contador de 4 bits por célula repartido en 4 planos de bits).
+    """
+    size = board.shape[0]
+    rows = pack_board(board)
+    
+    # Vecinos horizontales: desplazamiento de 1 bit con acarreo desde la palabra contigua
+    west = rows << _ONE
+    west[:, 1:] |= rows[:, :-1] >> _LAST_BIT
+    east = rows >> _ONE
+    east[:, :-1] |= rows[:, 1:] << _LAST_BIT
+    
+    # Vecinos verticales: desplazamiento de filas (fuera del tablero = células muertas)
+    planes = [west, east]
+    for horizontal in (rows, west, east):
+        above = np.zeros_like(horizontal)
+        above[1:] = horizontal[:-1]
+        below = np.zeros_like(horizontal)
+        below[:-1] = horizontal[1:]
+        planes += [above, below]
+    
+    # Árbol de sumadores: 8 planos de 1 bit -> conteo de 4 bits (0 a 8)
+    sum_a, carry_a = _full_adder(planes[0], planes[1], planes[2])
+    sum_b, carry_b = _full_adder(planes[3], planes[4], planes[5])
+    sum_c, carry_c = planes[6] ^ planes[7], planes[6] & planes[7]
+    bit0, carry_d = _full_adder(sum_a, sum_b, sum_c)
+    twos, fours_a = _full_adder(carry_a, carry_b, carry_c)
+    bit1, fours_b = twos ^ carry_d, twos & carry_d
+    bit2, bit3 = fours_a ^ fours_b, fours_a & fours_b
+    count_bits = [bit0, bit1, bit2, bit3]
+    
+    # Aplicar las reglas S/B y limpiar los bits de relleno de la última palabra
+    survives = _rule_plane(count_bits, survival_mask)
+    is_born = _rule_plane(count_bits, birth_mask)
+    new_rows = (rows & survives) | (~rows & is_born)
+    tail_bits = size % 64
+    if tail_bits:
+        new_rows[:, -1] &= (_ONE << np.uint64(tail_bits)) - _ONE
+    
+    return unpack_board(new_rows, size, out)
+
+# --- Kernel compilado con Numba (alternativa opcional) ---
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _next_generation_numba(board, survival_mask, birth_mask, out):
+        size = board.shape[0]
+        for i in prange(size):
+            for j in range(size):
+                # Contar vecinos vivos (fuera del tablero = células muertas)
+                total_live = 0
+                for di in range(-1, 2):
+                    for dj in range(-1, 2):
+                        ni = i + di
+                        nj = j + dj
+                        if (di != 0 or dj != 0) and 0 <= ni < size and 0 <= nj < size:
+                            total_live += board[ni, nj]
+                rule_mask = survival_mask if board[i, j] else birth_mask
+                out[i, j] = (rule_mask >> total_live) & 1
+
+
+def next_generation_numba(
+    board: np.ndarray, survival_mask: int, birth_mask: int, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+    """Igual que `next_generation`, pero con un kernel nativo compilado con Numba (paralelo por filas)."""
+    if out is None:
+        out = np.empty(board.shape, dtype=np.int8)
+    _next_generation_numba(board.astype(np.int8, copy=False), survival_mask, birth_mask, out)
+    return out
+
+
+def select_step_function(board_size: int) -> Callable[..., np.ndarray]:
+    """Elige el kernel de la simulación según SIMULATION_ENGINE y el tamaño del tablero."""
+    if SIMULATION_ENGINE == "numba" and njit is not None:
+        return next_generation_numba
+    if SIMULATION_ENGINE == "numpy":
+        return next_generation
+    if SIMULATION_ENGINE == "bitboard" or board_size >= BITBOARD_MIN_SIZE:
+        return next_generation_bitboard
+    return next_generation
+
+
+def warm_up_simulation_engine():
+    """Compila el kernel de Numba al iniciar la API para no pagar la latencia del JIT en el primer experimento."""
+    if SIMULATION_ENGINE != "numba":
+        return
+    if njit is None:
+        print("WARNING: SIMULATION_ENGINE=numba pero Numba no está instalado; se usará el motor NumPy.")
+        return
+    next_generation_numba(np.zeros((3, 3), dtype=np.int8), rules_to_mask([2, 3]), rules_to_mask([3]))
+
+
+def board_to_bytes(board: np.ndarray) -> bytes:
+    """Serializa el tablero como bits empaquetados (1 bit por célula, fila por fila) para columnas BYTEA."""
+    return np.packbits(board).tobytes()
 
 def get_db_connection():
-    """Retorna una nueva conexión a la BD."""
-    return psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD
-    )
+    """Toma una conexión psycopg2 del pool (`conn.close()` la devuelve al pool)."""
+    try:
+        return ENGINE.raw_connection()
+    except DBAPIError as e:
+        raise e.orig from e # Los endpoints manejan los errores nativos de psycopg2
+
+# --- Estado de los experimentos en memoria ---
+# La API corre con un único worker de uvicorn, así que este registro es compartido por todas las
+# peticiones: /status no consulta la BD para experimentos recientes y /status/{id}/wait despierta
+# en cuanto `simulate_and_insert` publica un cambio de estado.
+
+_experiment_status: Dict[int, dict] = {}
+_status_changed: Dict[int, asyncio.Event] = {}
+
+
+def build_status_payload(experiment_id: int, status: str, num_steps: int, duration, start_time, end_time) -> dict:
+    """Respuesta de /status con el estado, la duración y los metadatos de un experimento."""
+    return {
+        "experiment_id": experiment_id,
+        "status": status,
+        "total_steps": num_steps,
+        "duration_seconds": round(float(duration), 2) if duration else None,
+        "start_time": start_time.isoformat() if start_time else None,
+        "end_time": end_time.isoformat() if end_time else None
+    }
+
+
+def publish_status(experiment_id: int, status_data: dict):
+    """Guarda el estado en memoria de un experimento y despierta a las peticiones de long-polling."""
+    _experiment_status.pop(experiment_id, None)
+    _experiment_status[experiment_id] = status_data
+    while len(_experiment_status) > STATUS_CACHE_SIZE:
+        del _experiment_status[next(iter(_experiment_status))]
+    
+    event = _status_changed.pop(experiment_id, None)
+    if event is not None:
+        event.set()
+
 
 # --- Endpoints de la API ---
 
@@ -72,44 +325,49 @@ def get_db_connection():
 def read_root():
     return {"status": "Service Running", "project": "Conway Data Generator"}
 
-@app.post("/run_experiment")
-async def run_experiment(config: ExperimentConfig):
-    """
-    Endpoint para iniciar una simulación y guardarla en la BD.
-    Se ejecuta en segundo plano para no bloquear la API.
-    """
-    
-    # 1. Crear el registro del experimento (INSERT en raw_data.experiments)
-    conn = None
-    experiment_id = None
+def insert_experiment(config: ExperimentConfig, initial_board: np.ndarray, start_time: datetime.datetime) -> int:
+    """Inserta el experimento inicial y devuelve su experiment_id (bloqueante)."""
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        
-        start_time = datetime.datetime.now(datetime.timezone.utc)
-        
-        # Inicializar tablero aleatorio basado en la densidad
-        initial_board = np.random.choice(
-            a=[0, 1], 
-            size=(config.board_size, config.board_size), 
-            p=[1-config.initial_density, config.initial_density]
-        )
-        
-        # Insertar experimento inicial
         cur.execute(
             """INSERT INTO raw_data.experiments 
                (name, board_size, num_steps, initial_config, start_time, rules_notation, survival_rules, birth_rules) 
                VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING experiment_id;""",
-            (config.name, config.board_size, config.num_steps, str(initial_board.tolist()), start_time, 
-             config.rules_notation, str(config.survival_rules).strip('[]'), str(config.birth_rules).strip('[]'))
+            (config.name, config.board_size, config.num_steps, psycopg2.Binary(board_to_bytes(initial_board)), start_time, 
+             config.rules_notation, config.survival_rules, config.birth_rules)
         )
         experiment_id = cur.fetchone()[0]
         conn.commit()
-        
+        return experiment_id
+    finally:
+        conn.close()
+
+
+@app.post("/run_experiment")
+async def run_experiment(config: ExperimentConfig):
+    """
+    Endpoint para iniciar una simulación y guardarla en la BD.
+    Se ejecuta en segundo plano para no bloquear la API.
+    """
+    
+    # 1. Crear el registro del experimento (INSERT en raw_data.experiments)
+    start_time = datetime.datetime.now(datetime.timezone.utc)
+    
+    # Inicializar tablero aleatorio (int8 de 0/1) basado en la densidad
+    initial_board = (
+        np.random.random((config.board_size, config.board_size)) < config.initial_density
+    ).astype(np.int8)
+    
+    try:
+        # El INSERT es bloqueante: se ejecuta en el threadpool para no detener el event loop
+        experiment_id = await run_in_threadpool(insert_experiment, config, initial_board, start_time)
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error during setup: {e}")
-    finally:
-        if conn: conn.close()
+
+    publish_status(
+        experiment_id, build_status_payload(experiment_id, 'RUNNING', config.num_steps, None, start_time, None)
+    )
 
     # 2. Ejecutar la simulación en un proceso que no bloquee la API (Future/Task)
     asyncio.create_task(
@@ -117,17 +375,100 @@ async def run_experiment(config: ExperimentConfig):
             experiment_id, 
             config.num_steps, 
             initial_board, 
-            config.survival_rules,
-            config.birth_rules
+            rules_to_mask(config.survival_rules),
+            rules_to_mask(config.birth_rules),
+            start_time,
+            config.real_time
         )
     )
     
     return {"message": "Experiment started in background", "experiment_id": experiment_id}
 
 
+def status_response(request: Request, status_data: dict) -> Response:
+    """
+    Respuesta JSON del estado con su ETag. Si el cliente ya tiene esa versión (If-None-Match),
+    devuelve 304 Not Modified sin cuerpo.
+    """
+    body = json.dumps(status_data).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
 @app.get("/status/{experiment_id}")
-def get_experiment_status(experiment_id: int):
+def get_experiment_status(experiment_id: int, request: Request):
     """Consulta el estado, la duración y los metadatos de un experimento."""
+    status_data = _experiment_status.get(experiment_id)
+    if status_data is None:
+        status_data = fetch_experiment_status(experiment_id)
+    return status_response(request, status_data)
+
+
+@app.get("/status/{experiment_id}/wait")
+async def wait_experiment_status(experiment_id: int, request: Request, timeout: float = LONG_POLL_TIMEOUT):
+    """
+    Long-polling: mientras el experimento esté en curso, retiene la petición hasta que cambie
+    de estado o pasen `timeout` segundos (máximo LONG_POLL_TIMEOUT), y devuelve el estado actual
+    (304 sin cuerpo si no cambió respecto al ETag que envía el cliente).
+    """
+    status_data = await read_experiment_status(experiment_id)
+    if status_data["status"] == 'RUNNING':
+        # Sin `await` entre la lectura y el registro del evento: no se pierde ninguna publicación
+        event = _status_changed.setdefault(experiment_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=min(max(timeout, 0.0), LONG_POLL_TIMEOUT))
+        except asyncio.TimeoutError:
+            pass
+        status_data = await read_experiment_status(experiment_id)
+    return status_response(request, status_data)
+
+
+@app.get("/status/stream/{experiment_id}")
+async def stream_experiment_status(experiment_id: int):
+    """
+    Server-Sent Events: una única conexión por la que se envía el estado actual y después
+    cada cambio de estado, hasta que el experimento termina (COMPLETED o FAILED).
+    """
+    status_data = await read_experiment_status(experiment_id) # 404 antes de abrir el stream
+    return StreamingResponse(
+        status_events(experiment_id, status_data),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+async def status_events(experiment_id: int, status_data: dict):
+    """Genera los eventos SSE (`data: <json>`) de un experimento, con comentarios keep-alive entre cambios."""
+    while True:
+        # Sin `await` entre la lectura y el registro del evento: no se pierde ninguna publicación
+        status_data = _experiment_status.get(experiment_id, status_data)
+        event = None
+        if status_data["status"] == 'RUNNING':
+            event = _status_changed.setdefault(experiment_id, asyncio.Event())
+        
+        yield f"data: {json.dumps(status_data)}\n\n"
+        if event is None:
+            return
+        
+        while not event.is_set():
+            try:
+                await asyncio.wait_for(event.wait(), timeout=SSE_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+
+async def read_experiment_status(experiment_id: int) -> dict:
+    """Estado desde memoria o, si el experimento no está registrado, desde la BD (en el threadpool)."""
+    status_data = _experiment_status.get(experiment_id)
+    if status_data is None:
+        status_data = await run_in_threadpool(fetch_experiment_status, experiment_id)
+    return status_data
+
+
+def fetch_experiment_status(experiment_id: int) -> dict:
+    """Lee el estado de un experimento desde la BD."""
     conn = None
     try:
         conn = get_db_connection()
@@ -147,14 +488,7 @@ def get_experiment_status(experiment_id: int):
         # Devuelve el estado y las métricas clave
         status, duration, steps, start_time, end_time = result
         
-        return {
-            "experiment_id": experiment_id,
-            "status": status,
-            "total_steps": steps,
-            "duration_seconds": round(float(duration), 2) if duration else None,
-            "start_time": start_time.isoformat() if start_time else None,
-            "end_time": end_time.isoformat() if end_time else None
-        }
+        return build_status_payload(experiment_id, status, steps, duration, start_time, end_time)
 
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
@@ -162,72 +496,145 @@ def get_experiment_status(experiment_id: int):
         if conn: conn.close()
 
 
+INSERT_TRACE_SQL = """INSERT INTO raw_data.generation_trace 
+   (experiment_id, generation_num, capture_time, board_state, live_cells_count)
+   VALUES %s;"""
+
+
+COPY_TRACE_SQL = """COPY raw_data.generation_trace 
+   (experiment_id, generation_num, capture_time, board_state, live_cells_count)
+   FROM STDIN"""
+
+
+def insert_trace_batch(cur, rows: List[tuple]):
+    """Inserta varias generaciones de la traza con un único INSERT multi-fila (execute_values)."""
+    execute_values(cur, INSERT_TRACE_SQL, rows, page_size=100)
+
+
+def copy_trace_batch(cur, rows: List[tuple]):
+    """Carga varias generaciones de la traza con COPY ... FROM STDIN (formato texto, bytea en hex)."""
+    buffer = io.StringIO()
+    for experiment_id, generation_num, capture_time, board_state, live_cells_count in rows:
+        buffer.write(
+            f"{experiment_id}\t{generation_num}\t{capture_time.isoformat()}\t\\\\x{board_state.hex()}\t{live_cells_count}\n"
+        )
+    buffer.seek(0)
+    cur.copy_expert(COPY_TRACE_SQL, buffer)
+
+
+def commit_trace_batch(conn, flush_trace_batch: Callable, rows: List[tuple]):
+    """
+    Vuelca un lote de la traza con `flush_trace_batch` y confirma la transacción (bloqueante).
+    El COMMIT no espera al fsync del WAL: la traza es regenerable y perder los últimos lotes
+    ante una caída de PostgreSQL es aceptable. SET LOCAL limita el ajuste a esta transacción,
+    así no se filtra a otros usos de la conexión del pool.
+    """
+    cur = conn.cursor()
+    cur.execute("SET LOCAL synchronous_commit TO OFF;")
+    flush_trace_batch(cur, rows)
+    conn.commit()
+
+
+def finish_experiment(conn, experiment_id: int, end_time: datetime.datetime, duration: float):
+    """Marca el experimento como COMPLETED con su hora de fin y duración (bloqueante)."""
+    cur = conn.cursor()
+    cur.execute(
+        """UPDATE raw_data.experiments 
+           SET end_time = %s, duration_seconds = %s, status = 'COMPLETED'
+           WHERE experiment_id = %s;""",
+        (end_time, duration, experiment_id)
+    )
+    conn.commit()
+
+
+def fail_experiment(conn, experiment_id: int):
+    """Descarta la transacción en curso y marca el experimento como FAILED (bloqueante)."""
+    conn.rollback() # Descarta el lote pendiente si la transacción quedó abortada
+    cur = conn.cursor()
+    cur.execute("UPDATE raw_data.experiments SET status = 'FAILED' WHERE experiment_id = %s;", (experiment_id,))
+    conn.commit()
+
+
 async def simulate_and_insert(
     experiment_id: int,
     num_steps: int,
     initial_board: np.ndarray,
-    survival_rules: List[int],
-    birth_rules: List[int]
+    survival_mask: int,
+    birth_mask: int,
+    start_time: datetime.datetime,
+    real_time: bool = True
     ):
-    """Lógica de simulación asíncrona e ingesta."""
+    """
+    Lógica de simulación asíncrona e ingesta (`start_time` es el registrado por `run_experiment`).
+    En tiempo real la traza se inserta por lotes con execute_values; si no, sin pausas y con COPY.
+    El acceso a la BD (y el cálculo de tableros grandes) se ejecuta en el threadpool, de modo que
+    el event loop sigue atendiendo peticiones y otros experimentos mientras tanto.
+    """
     conn = None
-    board = initial_board
-    step_delay = 0.5 # Retraso de 0.5 segundos por paso
+    # Dos buffers int8 que se alternan entre generaciones: cada paso escribe en `next_board`
+    board = initial_board.astype(np.int8)
+    next_board = np.empty_like(board)
+    step_function = select_step_function(board.shape[0])
+    offload_step = board.shape[0] >= THREADPOOL_STEP_MIN_SIZE
+    if real_time:
+        step_delay = 0.5 # Retraso de 0.5 segundos por paso
+        batch_size, flush_trace_batch = TRACE_BATCH_SIZE, insert_trace_batch
+    else:
+        step_delay = 0 # Solo cede el control al event loop entre pasos
+        batch_size, flush_trace_batch = TRACE_COPY_BATCH_SIZE, copy_trace_batch
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # --- SOLUCIÓN: Recuperar el start_time de la BD ---
-        cur.execute("SELECT start_time FROM raw_data.experiments WHERE experiment_id = %s;", (experiment_id,))
-        experiment_data = cur.fetchone()
-        if not experiment_data:
-            raise Exception(f"Experiment ID {experiment_id} not found.")
-        start_time = experiment_data[0]
-        # ----------------------------------------------------
+        conn = await run_in_threadpool(get_db_connection)
 
+        # Invariantes del bucle resueltos una sola vez
+        now = datetime.datetime.now
+        utc = datetime.timezone.utc
+        
+        trace_batch = []
         for step in range(num_steps):
             
             # 1. Simular y calcular métricas RAW
-            current_time = datetime.datetime.now(datetime.timezone.utc)
-            live_cells_count = int(np.sum(board))
+            current_time = now(utc)
+            live_cells_count = int(board.sum(dtype=np.int32))
             
-            # 2. Ingesta de la Traza (raw_data.generation_trace)
-            cur.execute(
-                """INSERT INTO raw_data.generation_trace 
-                   (experiment_id, generation_num, capture_time, board_state, live_cells_count)
-                   VALUES (%s, %s, %s, %s, %s);""",
-                (experiment_id, step, current_time, str(board.tolist()), live_cells_count)
-            )
-            conn.commit()
+            # 2. Ingesta de la Traza (raw_data.generation_trace), por lotes de `batch_size` pasos
+            trace_batch.append((experiment_id, step, current_time, board_to_bytes(board), live_cells_count))
+            if len(trace_batch) >= batch_size:
+                await run_in_threadpool(commit_trace_batch, conn, flush_trace_batch, trace_batch)
+                trace_batch = []
             
             # 3. Calcular la próxima generación y esperar
-            board = next_generation(board, survival_rules, birth_rules)
+            if offload_step:
+                await run_in_threadpool(step_function, board, survival_mask, birth_mask, next_board)
+            else:
+                step_function(board, survival_mask, birth_mask, next_board)
+            board, next_board = next_board, board
             await asyncio.sleep(step_delay) # Espera asíncrona
 
+        # Volcar las generaciones pendientes del último lote
+        if trace_batch:
+            await run_in_threadpool(commit_trace_batch, conn, flush_trace_batch, trace_batch)
+
         # 4. Actualizar el estado final del experimento
         end_time = datetime.datetime.now(datetime.timezone.utc)
-        # --- SOLUCIÓN: start_time ya está definido aquí ---
         duration = (end_time - start_time).total_seconds() 
-        # --------------------------------------------------
         
-        cur.execute(
-            """UPDATE raw_data.experiments 
-               SET end_time = %s, duration_seconds = %s, status = 'COMPLETED'
-               WHERE experiment_id = %s;""",
-            (end_time, duration, experiment_id)
+        await run_in_threadpool(finish_experiment, conn, experiment_id, end_time, duration)
+        publish_status(
+            experiment_id,
+            build_status_payload(experiment_id, 'COMPLETED', num_steps, duration, start_time, end_time)
         )
-        conn.commit()
         
         print(f"INFO: Experimento {experiment_id} finalizado y actualizado.")
 
     except Exception as e:
         # En caso de fallo, registrar y actualizar el estado
         print(f"FATAL ERROR en Experimento {experiment_id}: {e}")
+        running_status = _experiment_status.get(experiment_id)
+        if running_status is not None:
+            publish_status(experiment_id, {**running_status, "status": 'FAILED'})
         if conn:
-            cur = conn.cursor()
-            cur.execute("UPDATE raw_data.experiments SET status = 'FAILED' WHERE experiment_id = %s;", (experiment_id,))
-            conn.commit()
+            await run_in_threadpool(fail_experiment, conn, experiment_id)
             
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: await run_in_threadpool(conn.close) # Devolverla al pool implica un ROLLBACK en la BD
\ No newline at end of file
@@ -1,11 +1,21 @@
 import streamlit as st
 import requests
-import json
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime # Importación necesaria para datetime.now()
-import time      # Importación necesaria para time.sleep()
 import os
-import re
-from typing import Optional, List
+import asyncio
+import functools
+import queue
+import threading
+from typing import Tuple
+
+# orjson es opcional: si está instalado (de)serializa el JSON de la API más rápido que `json`
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- Configuración (LEER DE VARIABLES DE ENTORNO) ---
 try:
@@ -14,22 +24,280 @@ except KeyError:
     st.error("🚨 ERROR FATAL: La variable de entorno 'API_HOST' no está definida.")
     st.stop()
 
+# Timeouts (conexión, lectura) en segundos de las peticiones a la API
+REQUEST_TIMEOUT = (3.05, 10)
+
+# Tiempo máximo (segundos) que la API retiene cada consulta de estado (long-polling)
+LONG_POLL_TIMEOUT = 10
+
+# Tiempo máximo (segundos) sin recibir datos del stream SSE (la API envía keep-alive cada 15 s)
+SSE_READ_TIMEOUT = 30
+
+# Reintentos ante fallos transitorios al consultar el estado: espera exponencial
+# (0.2 s, 0.26 s, 0.34 s, ... multiplicando por 1.3 hasta un máximo de 10 s)
+RETRY_DELAY_BASE = 0.2
+RETRY_DELAY_FACTOR = 1.3
+RETRY_DELAY_CAP = 10.0
+STATUS_MAX_RETRIES = 15
+
+# Cada cuántos segundos se redibuja el estado del experimento en curso
+STATUS_REFRESH_INTERVAL = 0.5
+
+# Duración mínima (segundos) de un experimento para celebrar su fin con globos
+BALLOONS_MIN_DURATION = 2
+
+# Estados con los que termina el seguimiento de un experimento
+FINAL_STATUSES = ('COMPLETED', 'FAILED')
+
+
+# show_spinner=False: el spinner de cache_resource (incluso en aciertos de caché) crearía un
+# elemento antes de `st.set_page_config` y la página fallaría en cada ejecución
+@st.cache_resource(show_spinner=False)
+def get_session() -> requests.Session:
+    """
+    Sesión HTTP compartida entre reruns: el POST y todas las consultas de estado reutilizan
+    las conexiones keep-alive del pool. urllib3 reintenta los fallos de conexión (el POST no se reenvía si ya llegó a la API).
+    """
+    session = requests.Session()
+    session.headers.update({"Connection": "keep-alive"})
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.3))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_status_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop en un hilo en segundo plano (uno por proceso) donde corren los seguimientos de
+    todos los experimentos, multiplexados sobre un único cliente HTTP asíncrono.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+@st.cache_resource(show_spinner=False)
+def get_async_client() -> httpx.AsyncClient:
+    """Cliente HTTP asíncrono compartido por los seguimientos (solo se usa desde `get_status_loop`)."""
+    return httpx.AsyncClient(limits=httpx.Limits(max_connections=16))
+
+
+@st.cache_resource(show_spinner=False)
+def warm_session() -> requests.Session:
+    """
+    Sesión compartida con una conexión ya abierta hacia la API (una sola vez por proceso), para
+    que el primer POST no pague el establecimiento de la conexión. Si la API no responde, se ignora.
+    """
+    session = get_session()
+    try:
+        session.get(f"{API_HOST}/", timeout=2)
+    except requests.exceptions.RequestException:
+        pass
+    return session
+
+
+session = warm_session()
+
 
 # --- Funciones de Utilidad ---
 
-def parse_rules(rules_str: str) -> Optional[List[int]]:
-    """Convierte una cadena de reglas (ej: '2,3') a una lista de enteros."""
-    if not rules_str:
-        return []
+# (De)serialización JSON de las peticiones y respuestas de la API
+if orjson is not None:
+    dumps_json = orjson.dumps
+    loads_json = orjson.loads
+else:
+    import json # Solo hace falta sin orjson
+    
+    def dumps_json(obj) -> bytes:
+        return json.dumps(obj).encode()
+    loads_json = json.loads
+
+
+@functools.lru_cache(maxsize=128)
+def parse_rules(rules_str: str) -> Tuple[Tuple[int, ...], str]:
+    """
+    Convierte una cadena de reglas (ej: '2,3') a una tupla de enteros (inmutable: el resultado se memoiza)
+    y, en la misma pasada, a su notación canónica para `rules_notation` (ej: '2,3').
+    """
+    nums = []
+    parts = []
+    current = -1 # Número en curso (-1: ninguno)
     
-    # Limpia la cadena y acepta solo dígitos y comas
-    cleaned_str = re.sub(r'[^\d,]', '', rules_str)
+    # Una sola pasada: acumula los dígitos, cierra el número en cada coma e ignora el resto de caracteres
+    for ch in rules_str:
+        digit = ord(ch) - 48
+        if 0 <= digit <= 9:
+            current = current * 10 + digit if current >= 0 else digit
+        elif ch == ',' and current >= 0:
+            nums.append(current)
+            parts.append(str(current)) # Normaliza ceros a la izquierda ('03' -> '3')
+            current = -1
+    if current >= 0:
+        nums.append(current)
+        parts.append(str(current))
     
+    return tuple(nums), ",".join(parts)
+
+
+# Acotada: la clave incluye el nombre del experimento, que lleva la fecha de cada sesión
+@st.cache_data(max_entries=32, show_spinner=False)
+def serialize_payload(
+    name: str,
+    board_size: int,
+    num_steps: int,
+    initial_density: float,
+    survival_rules: Tuple[int, ...],
+    birth_rules: Tuple[int, ...],
+    rules_notation: str,
+    real_time: bool
+    ) -> bytes:
+    """Cuerpo JSON de POST /run_experiment; una misma configuración reenviada reutiliza el cuerpo ya serializado."""
+    return dumps_json({
+        "name": name,
+        "board_size": board_size,
+        "num_steps": num_steps,
+        "initial_density": initial_density,
+        "survival_rules": list(survival_rules),    # Pasa la lista[int]
+        "birth_rules": list(birth_rules),          # Pasa la lista[int]
+        "rules_notation": rules_notation,          # Pasa la notación para la BD
+        "real_time": real_time                     # False: corrida por lotes (sin pausas, COPY)
+    })
+
+
+def error_detail(response: requests.Response) -> str:
+    """Mensaje de error de una respuesta de la API: su campo `detail` o, si no es JSON, el inicio del cuerpo."""
     try:
-        # Convierte cada número a entero y filtra los vacíos
-        return [int(n.strip()) for n in cleaned_str.split(',') if n.strip()]
+        return loads_json(response.content).get('detail', response.text[:200])
     except ValueError:
-        return None # Indica un fallo en el parsing
+        return response.text[:200]
+
+
+async def stream_status(client: httpx.AsyncClient, exp_id: int):
+    """Itera los estados del experimento que la API envía por Server-Sent Events (/status/stream/{exp_id})."""
+    timeout = httpx.Timeout(SSE_READ_TIMEOUT, connect=REQUEST_TIMEOUT[0])
+    async with client.stream("GET", f"{API_HOST}/status/stream/{exp_id}", timeout=timeout) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            # Solo interesan las líneas `data:`; los comentarios `:` son keep-alive
+            if line.startswith("data:"):
+                yield loads_json(line[len("data:"):])
+
+
+def show_status(status_placeholder, exp_id: int, rules_notation: str, status_data: dict):
+    """Muestra el estado del experimento."""
+    current_status = status_data['status']
+    
+    if current_status == 'COMPLETED':
+        duration = status_data.get('duration_seconds')
+        if duration is not None and duration > BALLOONS_MIN_DURATION:
+            st.balloons() 
+        status_placeholder.success(f"🎉 **Experimento #{exp_id} COMPLETADO** ({rules_notation}) en {duration} segundos.")
+        
+        st.markdown("---")
+        st.subheader(f"Metadatos Registrados")
+        st.json(status_data)
+    
+    elif current_status == 'FAILED':
+        status_placeholder.error(f"❌ Experimento #{exp_id} FALLÓ. Revisa los logs de la API.")
+        st.json(status_data)
+    
+    else: # RUNNING
+        status_placeholder.warning(f"⏳ Experimento #{exp_id} en curso (Status: {current_status})...")
+
+
+async def watch_status(client: httpx.AsyncClient, exp_id: int, updates: queue.Queue):
+    """
+    Sigue el estado de un experimento (en el event loop de `get_status_loop`) y deja cada novedad
+    en `updates`: ("status", status_data), ("retry", segundos de espera) o ("error", mensaje).
+    No usa `st`: la interfaz la dibuja el fragmento `status_monitor` en el hilo del script.
+    """
+    # La lectura del long-polling espera el tiempo completo de retención más el margen habitual
+    long_poll_timeout = httpx.Timeout(LONG_POLL_TIMEOUT + REQUEST_TIMEOUT[1], connect=REQUEST_TIMEOUT[0])
+    try:
+        last_sent = None # Último estado encolado: solo se encolan los cambios
+        try:
+            # Canal principal: la API empuja cada cambio de estado por una única conexión SSE
+            async for status_data in stream_status(client, exp_id):
+                if status_data != last_sent:
+                    last_sent = status_data
+                    updates.put(("status", status_data))
+                    if status_data['status'] in FINAL_STATUSES:
+                        return
+        except (httpx.HTTPError, ValueError):
+            pass # Stream cortado o no disponible: se sigue con long-polling
+        
+        retry_delay = RETRY_DELAY_BASE
+        retries = 0
+        etag = None # ETag del último estado recibido: la API responde 304 si no cambió
+        
+        while True:
+            # Respaldo por long-polling: la API responde en cuanto cambia el estado (o tras LONG_POLL_TIMEOUT segundos)
+            try:
+                status_response = await client.get(
+                    f"{API_HOST}/status/{exp_id}/wait",
+                    params={"timeout": LONG_POLL_TIMEOUT},
+                    headers={"If-None-Match": etag} if etag else None,
+                    timeout=long_poll_timeout
+                )
+            except httpx.TransportError:
+                status_response = None # Fallo transitorio: se reintenta abajo
+            
+            if status_response is not None and status_response.status_code == 304:
+                # Sin cambios desde el último estado: nada que encolar
+                retry_delay = RETRY_DELAY_BASE
+                retries = 0
+            
+            elif status_response is not None and status_response.status_code == 200:
+                retry_delay = RETRY_DELAY_BASE
+                retries = 0
+                etag = status_response.headers.get("ETag")
+                status_data = loads_json(status_response.content)
+                if status_data != last_sent: # Puede ser el mismo estado que ya llegó por SSE
+                    last_sent = status_data
+                    updates.put(("status", status_data))
+                    if status_data['status'] in FINAL_STATUSES:
+                        return
+            
+            elif (status_response is None or status_response.status_code >= 500) and retries < STATUS_MAX_RETRIES:
+                # API caída o reiniciándose: reintentar con espera exponencial
+                updates.put(("retry", retry_delay))
+                last_sent = None # El aviso sustituye al estado: volver a encolarlo al recuperarse
+                etag = None
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(RETRY_DELAY_CAP, retry_delay * RETRY_DELAY_FACTOR)
+                retries += 1
+            
+            else:
+                updates.put(("error", "Error al consultar el estado de la API."))
+                return
+    
+    except Exception as e:
+        updates.put(("error", f"Ocurrió un error inesperado en el frontend: {e}"))
+
+
+def is_final(update: tuple) -> bool:
+    """Indica si una novedad de `watch_status` cierra el seguimiento (estado final o error)."""
+    kind, payload = update
+    return kind == "error" or (kind == "status" and payload['status'] in FINAL_STATUSES)
+
+
+def show_update(status_placeholder, monitor: dict, update: tuple):
+    """Muestra una novedad de `watch_status` del experimento que sigue `monitor`."""
+    kind, payload = update
+    exp_id = monitor["exp_id"]
+    if kind == "started":
+        status_placeholder.warning(
+            f"⏳ Experimento **#{exp_id}** iniciado ({monitor['rules_notation']}). Monitoreando estado..."
+        )
+    elif kind == "status":
+        show_status(status_placeholder, exp_id, monitor["rules_notation"], payload)
+    elif kind == "retry":
+        status_placeholder.warning(
+            f"⚠️ No se pudo consultar el estado del experimento #{exp_id}. Reintentando en {payload:.1f} s..."
+        )
+    else: # error
+        status_placeholder.error(payload)
 
 
 # --- Estructura de la Interfaz ---
@@ -38,133 +306,187 @@ st.set_page_config(page_title="Conway Data Generator", layout="centered")
 st.title("🔬 Plataforma de Generación de Datos RAW")
 st.subheader("Simulación y Registro de Experimentos de Autómatas Celulares")
 
-# Definimos el nombre por defecto aquí
-default_name = "Corrida_Automatica_" + datetime.datetime.now().strftime("%Y%m%d_%H%M")
+# Nombre por defecto: se calcula una vez por sesión del navegador, no en cada rerun
+if "default_name" not in st.session_state:
+    st.session_state.default_name = "Corrida_Automatica_" + datetime.datetime.now().strftime("%Y%m%d_%H%M")
+default_name = st.session_state.default_name
 
 
-# --- Formulario de Configuración de Experimento ---
+# --- Lógica de Envío ---
 
-with st.form("experiment_form"):
-    st.markdown("### 1. Parámetros de la Simulación")
-    
-    experiment_name = st.text_input("Nombre del Experimento", value=default_name)
-    
-    col_size, col_steps, col_density = st.columns(3)
+def submit_experiment():
+    """
+    Callback del botón del formulario (se ejecuta antes del rerun): valida las reglas, inicia el
+    experimento y arranca su seguimiento en segundo plano. Los errores quedan en
+    `st.session_state.submit_error` para mostrarlos bajo el formulario.
+    """
+    state = st.session_state
     
-    with col_size:
-        board_size = st.slider("Tamaño del Tablero", min_value=10, max_value=100, value=25, step=5)
-    with col_steps:
-        num_steps = st.slider("Número de Pasos/Generaciones", min_value=10, max_value=200, value=50, step=10)
-    with col_density:
-        initial_density = st.slider("Densidad Inicial", min_value=0.1, max_value=0.9, value=0.4, step=0.05)
+    # La configuración enviada rellena el formulario cuando vuelve a mostrarse tras el seguimiento
+    config = {
+        "name": state.form_name,
+        "board_size": state.form_board_size,
+        "num_steps": state.form_num_steps,
+        "initial_density": state.form_initial_density,
+        "real_time": state.form_real_time,
+        "survival_rules_str": state.form_survival_rules,
+        "birth_rules_str": state.form_birth_rules
+    }
+    state.last_config = config
     
-    st.markdown("---")
-    st.markdown("### 2. Reglas del Autómata Celular (Notación S/B)")
+    # Parsear las reglas (los caracteres que no son dígitos ni comas se ignoran)
+    survival_rules, survival_notation = parse_rules(config["survival_rules_str"])
+    birth_rules, birth_notation = parse_rules(config["birth_rules_str"])
+
+    # Construir la notación S/B para la auditoría en la BD
+    rules_notation = f"B{birth_notation}/S{survival_notation}"
     
-    col_survival, col_birth = st.columns(2)
+    # 1. Preparar la carga útil (Payload), ya serializada
+    payload = serialize_payload(
+        config["name"], config["board_size"], config["num_steps"], config["initial_density"],
+        survival_rules, birth_rules, rules_notation, config["real_time"]
+    )
     
-    with col_survival:
-        survival_rules_str = st.text_input(
-            "Reglas de Supervivencia (S)", 
-            value="2,3", 
-            help="Números de vecinos para que una célula VIVA sobreviva. Ej: '2,3' (Conway)."
+    try:
+        # 2. Llamada a la API para iniciar (POST /run_experiment)
+        response = session.post(
+            f"{API_HOST}/run_experiment",
+            data=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=REQUEST_TIMEOUT
         )
+    except requests.exceptions.ConnectionError:
+        state.submit_error = f"🚨 **¡Error de Conexión!** Asegúrate de que tu API (uvicorn) esté corriendo en {API_HOST}."
+        return
+    except requests.exceptions.Timeout:
+        state.submit_error = f"⌛ La API en {API_HOST} no respondió a tiempo. Inténtalo de nuevo."
+        return
+    except Exception as e:
+        state.submit_error = f"Ocurrió un error inesperado en el frontend: {e}"
+        return
     
-    with col_birth:
-        birth_rules_str = st.text_input(
-            "Reglas de Nacimiento (B)", 
-            value="3", 
-            help="Números de vecinos para que una célula MUERTA nazca. Ej: '3' (Conway)."
-        )
+    if response.status_code != 200:
+        state.submit_error = f"❌ Error al iniciar (Código {response.status_code}): {error_detail(response)}"
+        return
+    exp_id = loads_json(response.content).get("experiment_id")
     
-    st.markdown("---")
-    submitted = st.form_submit_button("🚀 Iniciar Experimento Configurable")
+    # --- Seguimiento en segundo plano ---
+    # El event loop de fondo consulta la API y el fragmento `status_monitor` dibuja sus
+    # novedades, sin bloquear el script de Streamlit durante todo el experimento
+    updates = queue.Queue()
+    state.monitor = {
+        "exp_id": exp_id,
+        "rules_notation": rules_notation,
+        "updates": updates,
+        "view": ("started", None), # Novedad más reciente
+        "shown": None              # Novedad dibujada en el placeholder
+    }
+    asyncio.run_coroutine_threadsafe(
+        watch_status(get_async_client(), exp_id, updates), get_status_loop()
+    )
 
 
-# --- Lógica de Envío ---
+# --- Seguimiento del Experimento ---
 
-if submitted:
+@st.fragment(run_every=STATUS_REFRESH_INTERVAL)
+def status_monitor(status_placeholder):
+    """
+    Se re-ejecuta cada STATUS_REFRESH_INTERVAL segundos (sin recargar la página) y dibuja en
+    `status_placeholder` la novedad más reciente de `watch_status`, solo si cambió. El placeholder
+    se crea fuera del fragmento para que conserve lo dibujado en las ejecuciones que no lo tocan.
+    Al terminar el seguimiento fuerza un rerun completo, que deja de programar el fragmento y
+    vuelve a mostrar el formulario con el resultado final.
+    """
+    monitor = st.session_state.monitor
     
-    # Validar y parsear las reglas
-    survival_rules = parse_rules(survival_rules_str)
-    birth_rules = parse_rules(birth_rules_str)
+    # Solo importa la novedad más reciente: se vacía la cola y se dibuja una vez por ejecución
+    updates = monitor["updates"]
+    while True:
+        try:
+            monitor["view"] = updates.get_nowait()
+        except queue.Empty:
+            break
     
-    if survival_rules is None or birth_rules is None:
-        st.error("❌ Error: Las reglas de Supervivencia o Nacimiento contienen caracteres no válidos (solo se permiten números y comas).")
-        st.stop()
+    if is_final(monitor["view"]):
+        st.session_state.finished = st.session_state.pop("monitor")
+        st.rerun()
+    if monitor["view"] != monitor["shown"]:
+        show_update(status_placeholder, monitor, monitor["view"])
+        monitor["shown"] = monitor["view"]
 
-    # Construir la notación S/B para la auditoría en la BD
-    rules_notation = f"B{','.join(map(str, birth_rules))}/S{','.join(map(str, survival_rules))}"
+
+if "monitor" in st.session_state:
+    # Durante el seguimiento solo se dibuja el estado: el formulario no se reconstruye.
+    # Un rerun completo crea un placeholder vacío, así que la novedad actual se vuelve a dibujar.
+    st.session_state.monitor["shown"] = None
+    status_monitor(st.empty())
+else:
     
-    # 1. Preparar la carga útil (Payload)
-    payload = {
-        "name": experiment_name,
-        "board_size": board_size,
-        "num_steps": num_steps,
-        "initial_density": initial_density,
-        "survival_rules": survival_rules,    # Pasa la lista[int]
-        "birth_rules": birth_rules,          # Pasa la lista[int]
-        "rules_notation": rules_notation     # Pasa la notación para la BD
-    }
+    # --- Formulario de Configuración de Experimento ---
     
-    # Placeholder para mostrar el estado en tiempo real
-    status_placeholder = st.empty() 
+    config = st.session_state.get("last_config", {})
     
-    try:
-        # 2. Llamada a la API para iniciar (POST /run_experiment)
-        status_placeholder.info(f"Enviando solicitud para iniciar: {API_HOST}/run_experiment con reglas: {rules_notation}")
-        response = requests.post(f"{API_HOST}/run_experiment", json=payload)
+    with st.form("experiment_form"):
+        st.markdown("### 1. Parámetros de la Simulación")
         
-        # ... (El resto de la lógica de polling y manejo de errores permanece igual) ...
-        # (Espera que hayas pegado la lógica de polling corregida de un paso anterior)
+        st.text_input("Nombre del Experimento", value=config.get("name", default_name), key="form_name")
         
-        if response.status_code != 200:
-            status_placeholder.error(f"❌ Error al iniciar (Código {response.status_code}): {response.json().get('detail', 'Error desconocido')}")
-        else:
-            result = response.json()
-            exp_id = result.get("experiment_id")
-            
-            # --- INICIO DEL POLLING ---
-            
-            status_placeholder.warning(f"⏳ Experimento **#{exp_id}** iniciado ({rules_notation}). Monitoreando estado...")
-            
-            status_loop = True
-            
-            while status_loop:
-                time.sleep(1) 
-                
-                status_response = requests.get(f"{API_HOST}/status/{exp_id}")
-                
-                if status_response.status_code == 200:
-                    status_data = status_response.json()
-                    current_status = status_data['status']
-                    
-                    if current_status == 'COMPLETED':
-                        duration = status_data.get('duration_seconds')
-                        st.balloons() 
-                        status_placeholder.success(f"🎉 **Experimento #{exp_id} COMPLETADO** ({rules_notation}) en {duration} segundos.")
-                        
-                        st.markdown("---")
-                        st.subheader(f"Metadatos Registrados")
-                        st.json(status_data)
-                        status_loop = False
-                    
-                    elif current_status == 'FAILED':
-                        status_placeholder.error(f"❌ Experimento #{exp_id} FALLÓ. Revisa los logs de la API.")
-                        st.json(status_data)
-                        status_loop = False
-                    
-                    else: # RUNNING
-                        status_placeholder.warning(f"⏳ Experimento #{exp_id} en curso (Status: {current_status})...")
-                        
-                else:
-                    status_placeholder.error("Error al consultar el estado de la API.")
-                    status_loop = False
-                    
-    except requests.exceptions.ConnectionError:
-        status_placeholder.error(f"🚨 **¡Error de Conexión!** Asegúrate de que tu API (uvicorn) esté corriendo en {API_HOST}.")
-    except Exception as e:
-        status_placeholder.error(f"Ocurrió un error inesperado en el frontend: {e}")
+        col_size, col_steps, col_density = st.columns(3)
+        
+        with col_size:
+            st.slider(
+                "Tamaño del Tablero", min_value=10, max_value=100, value=config.get("board_size", 25), step=5,
+                key="form_board_size"
+            )
+        with col_steps:
+            st.slider(
+                "Número de Pasos/Generaciones", min_value=10, max_value=200, value=config.get("num_steps", 50), step=10,
+                key="form_num_steps"
+            )
+        with col_density:
+            st.slider(
+                "Densidad Inicial", min_value=0.1, max_value=0.9, value=config.get("initial_density", 0.4), step=0.05,
+                key="form_initial_density"
+            )
+        
+        st.checkbox(
+            "Simulación en tiempo real",
+            value=config.get("real_time", True),
+            help="Registra una generación cada 0.5 s. Desactívalo para corridas por lotes: sin pausas y con carga masiva (COPY).",
+            key="form_real_time"
+        )
+        
+        st.markdown("---")
+        st.markdown("### 2. Reglas del Autómata Celular (Notación S/B)")
+        
+        col_survival, col_birth = st.columns(2)
+        
+        with col_survival:
+            st.text_input(
+                "Reglas de Supervivencia (S)", 
+                value=config.get("survival_rules_str", "2,3"), 
+                help="Números de vecinos para que una célula VIVA sobreviva. Ej: '2,3' (Conway).",
+                key="form_survival_rules"
+            )
+        
+        with col_birth:
+            st.text_input(
+                "Reglas de Nacimiento (B)", 
+                value=config.get("birth_rules_str", "3"), 
+                help="Números de vecinos para que una célula MUERTA nazca. Ej: '3' (Conway).",
+                key="form_birth_rules"
+            )
+        
+        st.markdown("---")
+        st.form_submit_button("🚀 Iniciar Experimento Configurable", on_click=submit_experiment)
+    
+    if "submit_error" in st.session_state:
+        st.error(st.session_state.pop("submit_error"))
+    
+    if "finished" in st.session_state:
+        # El resultado final se muestra una sola vez, en el rerun que cierra el seguimiento
+        finished = st.session_state.pop("finished")
+        show_update(st.empty(), finished, finished["view"])
 
 # --- Información Adicional ---
 
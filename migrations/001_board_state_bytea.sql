@@ -0,0 +1,21 @@
+-- migrations/001_board_state_bytea.sql
+-- Convierte raw_data.generation_trace.board_state de TEXT ('[[0, 1], ...]') a BYTEA de bits empaquetados.
+-- Solo es necesaria para BDs creadas con una versión anterior de schema_setup.sql:
+--   docker exec -i cass_postgres_db psql -U $DB_USER -d $DB_NAME < migrations/001_board_state_bytea.sql
+
+-- Empaqueta la lista de listas en texto con el mismo formato que np.packbits (bit más significativo primero)
+CREATE OR REPLACE FUNCTION raw_data.pack_board_text(board TEXT) RETURNS BYTEA AS $$
+    SELECT decode(
+        string_agg(lpad(to_hex(rpad(substr(b.bits, i, 8), 8, '0')::bit(8)::int), 2, '0'), '' ORDER BY i),
+        'hex'
+    )
+    FROM (SELECT regexp_replace(board, '[^01]', '', 'g') AS bits) b,
+         generate_series(1, length(b.bits), 8) AS i;
+$$ LANGUAGE SQL IMMUTABLE STRICT;
+
+BEGIN;
+
+ALTER TABLE raw_data.generation_trace
+    ALTER COLUMN board_state TYPE BYTEA USING raw_data.pack_board_text(board_state);
+
+COMMIT;
@@ -0,0 +1,14 @@
+-- migrations/002_experiment_config_types.sql
+-- Convierte raw_data.experiments a tipos nativos:
+--   * initial_config: TEXT ('[[0, 1], ...]') -> BYTEA de bits empaquetados (como board_state)
+--   * survival_rules / birth_rules: VARCHAR ('2, 3') -> INTEGER[]
+-- Requiere la función raw_data.pack_board_text creada en 001_board_state_bytea.sql.
+
+BEGIN;
+
+ALTER TABLE raw_data.experiments
+    ALTER COLUMN initial_config TYPE BYTEA USING raw_data.pack_board_text(initial_config),
+    ALTER COLUMN survival_rules TYPE INTEGER[] USING string_to_array(survival_rules, ',')::INTEGER[],
+    ALTER COLUMN birth_rules TYPE INTEGER[] USING string_to_array(birth_rules, ',')::INTEGER[];
+
+COMMIT;
@@ -8,14 +8,14 @@ CREATE TABLE IF NOT EXISTS raw_data.experiments (
     name VARCHAR(255) NOT NULL,
     board_size INTEGER NOT NULL,
     num_steps INTEGER NOT NULL,
-    initial_config TEXT,
+    initial_config BYTEA, -- Bits empaquetados (np.packbits), board_size x board_size
     start_time TIMESTAMP WITH TIME ZONE NOT NULL,
     end_time TIMESTAMP WITH TIME ZONE,
     duration_seconds NUMERIC,
     status VARCHAR(50) DEFAULT 'RUNNING',
     rules_notation VARCHAR(50) NOT NULL,
-    survival_rules VARCHAR(20),
-    birth_rules VARCHAR(20)
+    survival_rules INTEGER[],
+    birth_rules INTEGER[]
 );
 
 CREATE TABLE IF NOT EXISTS raw_data.generation_trace (
@@ -23,7 +23,7 @@ CREATE TABLE IF NOT EXISTS raw_data.generation_trace (
     experiment_id INTEGER NOT NULL,
     generation_num INTEGER NOT NULL,
     capture_time TIMESTAMP WITH TIME ZONE NOT NULL,
-    board_state TEXT NOT NULL,
+    board_state BYTEA NOT NULL, -- Bits empaquetados (np.packbits), board_size x board_size
     live_cells_count INTEGER,
     
     CONSTRAINT fk_experiment